@@ -15,15 +15,20 @@
 # limitations under the License.
 #
 
-import glob
+import atexit
+import multiprocessing
 import os
 import sys
+from collections import defaultdict
 from itertools import chain
+from multiprocessing.pool import ThreadPool
 import time
 import operator
 import tempfile
 import random
 import struct
+import threading
+import traceback
 from functools import reduce
 
 if sys.version_info[:2] <= (2, 6):
@@ -35,6 +40,8 @@ if sys.version_info[:2] <= (2, 6):
 else:
     import unittest
 
+from py4j.java_gateway import Py4JJavaError
+
 from pyspark.context import SparkConf, SparkContext, RDD
 from pyspark.storagelevel import StorageLevel
 from pyspark.streaming.context import StreamingContext
@@ -43,33 +50,131 @@ from pyspark.streaming.flume import FlumeUtils
 from pyspark.streaming.mqtt import MQTTUtils
 from pyspark.streaming.kinesis import KinesisUtils, InitialPositionInStream
 
+# Must be same as the variable and condition defined in KinesisTestUtils.scala
+kinesis_test_environ_var = "ENABLE_KINESIS_TESTS"
+are_kinesis_tests_enabled = os.environ.get(kinesis_test_environ_var) == '1'
+
+# batches shared by several basic operation tests; treat as read-only
+_RANGE_INPUT = [list(range(1, 5)), list(range(5, 9)), list(range(9, 13))]
+
+# contents of the files fed to the file-based input streams
+_NUM_PAYLOAD = "".join("%d\n" % i for i in range(10)).encode("ascii")
+_BINARY_PAYLOAD = bytes(bytearray(range(10)))
+
+
+def _write_file(path, data):
+    """Write `data` to `path` with a single write() call."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+# updateStateByKey() functions; at module level they can be pickled by reference
+def _list_extend_updater(vs, s):
+    if not s:
+        s = []
+    s.extend(vs)
+    return s
+
+
+def _sum_updater(vs, s):
+    return sum(vs, s or 0)
+
+
+# test helper classes from the assembly jars, loaded once per JVM gateway
+_jvm_classes = {}
+
+
+def _load_jvm_class(sc, name):
+    """Load the JVM class `name` through the context class loader, reusing earlier loads."""
+    if name not in _jvm_classes:
+        loader = sc._jvm.java.lang.Thread.currentThread().getContextClassLoader()
+        _jvm_classes[name] = loader.loadClass(name)
+    return _jvm_classes[name]
+
+
+_sc_lock = threading.Lock()
+_sc = None
+
+
+def _get_or_create_spark_context():
+    """
+    Return the SparkContext shared by all test classes in this module,
+    creating it on first use.
+    """
+    global _sc
+    with _sc_lock:
+        if _sc is None:
+            # Keep the default PickleSerializer: MarshalSerializer cannot encode the
+            # ResultIterable values that cogroup() hands from one DStream to the next.
+            conf = SparkConf().set("spark.default.parallelism", 1)
+            # reuse Python workers across the many tiny batches, whatever spark-defaults says
+            conf.set("spark.python.worker.reuse", "true")
+            _sc = SparkContext(appName="PySparkStreamingTests", conf=conf)
+            _sc.setCheckpointDir("/tmp")
+        return _sc
+
+
+def _stop_spark_context():
+    """Stop the shared SparkContext, if any; the next user will recreate it."""
+    global _sc
+    with _sc_lock:
+        if _sc is not None:
+            _sc.stop()
+            _sc = None
+
+
+atexit.register(_stop_spark_context)
+
 
 class PySparkStreamingTestCase(unittest.TestCase):
 
     timeout = 10  # seconds
-    duration = .5
+    duration = .1
 
     @classmethod
     def setUpClass(cls):
-        class_name = cls.__name__
-        conf = SparkConf().set("spark.default.parallelism", 1)
-        cls.sc = SparkContext(appName=class_name, conf=conf)
-        cls.sc.setCheckpointDir("/tmp")
+        cls.sc = _get_or_create_spark_context()
+        cls._rdd_cache = {}
 
     @classmethod
-    def tearDownClass(cls):
-        cls.sc.stop()
+    def _cached_rdd(cls, data):
+        """
+        Return a single-partition RDD holding `data`, reusing the one
+        parallelized by an earlier test of this class for equal data.
+        """
+        key = tuple(data)
+        rdd = cls._rdd_cache.get(key)
+        if rdd is None:
+            rdd = cls.sc.parallelize(list(key), 1)
+            cls._rdd_cache[key] = rdd
+        return rdd
 
     def setUp(self):
         self.ssc = StreamingContext(self.sc, self.duration)
+        self._cond = threading.Condition()
 
     def tearDown(self):
+        # A stopped StreamingContext cannot be restarted, and only one may be active per
+        # JVM, so this has to finish before the next test starts its own context.
         self.ssc.stop(False)
 
     def wait_for(self, result, n):
+        """
+        Block until `result` has at least `n` items or the timeout expires.
+
+        Whoever fills `result` must do so while holding `self._cond` and
+        call `notify_all()` on it afterwards.
+        """
         start_time = time.time()
-        while len(result) < n and time.time() - start_time < self.timeout:
-            time.sleep(0.01)
+        with self._cond:
+            while len(result) < n:
+                remaining = self.timeout - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
         if len(result) < n:
             print("timeout after", self.timeout)
 
@@ -81,7 +186,10 @@ class PySparkStreamingTestCase(unittest.TestCase):
 
         def take(_, rdd):
             if rdd and len(results) < n:
-                results.extend(rdd.take(n - len(results)))
+                taken = rdd.take(n - len(results))
+                with self._cond:
+                    results.extend(taken)
+                    self._cond.notify_all()
 
         dstream.foreachRDD(take)
 
@@ -101,7 +209,9 @@ class PySparkStreamingTestCase(unittest.TestCase):
             if rdd and len(result) < n:
                 r = rdd.collect()
                 if r:
-                    result.append(r)
+                    with self._cond:
+                        result.append(r)
+                        self._cond.notify_all()
 
         dstream.foreachRDD(get_output)
 
@@ -119,10 +229,10 @@ class PySparkStreamingTestCase(unittest.TestCase):
         @param expected: expected output for this testcase.
         """
         if not isinstance(input[0], RDD):
-            input = [self.sc.parallelize(d, 1) for d in input]
+            input = [self._cached_rdd(d) for d in input]
         input_stream = self.ssc.queueStream(input)
         if input2 and not isinstance(input2[0], RDD):
-            input2 = [self.sc.parallelize(d, 1) for d in input2]
+            input2 = [self._cached_rdd(d) for d in input2]
         input_stream2 = self.ssc.queueStream(input2) if input2 is not None else None
 
         # Apply test function to stream.
@@ -133,21 +243,22 @@ class PySparkStreamingTestCase(unittest.TestCase):
 
         result = self._collect(stream, len(expected))
         if sort:
+            # `expected` must already be listed in key order
             self._sort_result_based_on_key(result)
-            self._sort_result_based_on_key(expected)
         self.assertEqual(expected, result)
 
     def _sort_result_based_on_key(self, outputs):
         """Sort the list based on first value."""
+        key = operator.itemgetter(0)
         for output in outputs:
-            output.sort(key=lambda x: x[0])
+            output.sort(key=key)
 
 
 class BasicOperationTests(PySparkStreamingTestCase):
 
     def test_map(self):
         """Basic operation test for DStream.map."""
-        input = [range(1, 5), range(5, 9), range(9, 13)]
+        input = _RANGE_INPUT
 
         def func(dstream):
             return dstream.map(str)
@@ -156,7 +267,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
     def test_flatMap(self):
         """Basic operation test for DStream.faltMap."""
-        input = [range(1, 5), range(5, 9), range(9, 13)]
+        input = _RANGE_INPUT
 
         def func(dstream):
             return dstream.flatMap(lambda x: (x, x * 2))
@@ -166,7 +277,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
     def test_filter(self):
         """Basic operation test for DStream.filter."""
-        input = [range(1, 5), range(5, 9), range(9, 13)]
+        input = _RANGE_INPUT
 
         def func(dstream):
             return dstream.filter(lambda x: x % 2 == 0)
@@ -184,7 +295,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
     def test_reduce(self):
         """Basic operation test for DStream.reduce."""
-        input = [range(1, 5), range(5, 9), range(9, 13)]
+        input = _RANGE_INPUT
 
         def func(dstream):
             return dstream.reduce(operator.add)
@@ -231,7 +342,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
     def test_glom(self):
         """Basic operation test for DStream.glom."""
-        input = [range(1, 5), range(5, 9), range(9, 13)]
+        input = _RANGE_INPUT
         rdds = [self.sc.parallelize(r, 2) for r in input]
 
         def func(dstream):
@@ -241,7 +352,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
     def test_mapPartitions(self):
         """Basic operation test for DStream.mapPartitions."""
-        input = [range(1, 5), range(5, 9), range(9, 13)]
+        input = _RANGE_INPUT
         rdds = [self.sc.parallelize(r, 2) for r in input]
 
         def func(dstream):
@@ -271,7 +382,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
         expected = [[(1, [1]), (2, [1]), (3, [1]), (4, [1])],
                     [(1, [1, 1, 1]), (2, [1, 1]), (3, [1])],
-                    [("a", [1, 1]), ("b", [1]), ("", [1, 1, 1])]]
+                    [("", [1, 1, 1]), ("a", [1, 1]), ("b", [1])]]
         self._test_func(input, func, expected, sort=True)
 
     def test_combineByKey(self):
@@ -286,7 +397,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
             return dstream.combineByKey(str, add, add)
         expected = [[(1, "1"), (2, "1"), (3, "1"), (4, "1")],
                     [(1, "111"), (2, "11"), (3, "1")],
-                    [("a", "11"), ("b", "1"), ("", "111")]]
+                    [("", "111"), ("a", "11"), ("b", "1")]]
         self._test_func(input, func, expected, sort=True)
 
     def test_repartition(self):
@@ -321,7 +432,7 @@ class BasicOperationTests(PySparkStreamingTestCase):
 
         expected = [[(1, ([1], [2])), (2, ([1], [])), (3, ([1], []))],
                     [(1, ([1, 1, 1], [])), (2, ([1], [])), (4, ([], [1]))],
-                    [("a", ([1, 1], [1, 1])), ("b", ([1], [1])), ("", ([1, 1], [1, 2]))]]
+                    [("", ([1, 1], [1, 2])), ("a", ([1, 1], [1, 1])), ("b", ([1], [1]))]]
         self._test_func(input, func, expected, sort=True, input2=input2)
 
     def test_join(self):
@@ -365,17 +476,10 @@ class BasicOperationTests(PySparkStreamingTestCase):
         self._test_func(input, func, expected, True, input2)
 
     def test_update_state_by_key(self):
-
-        def updater(vs, s):
-            if not s:
-                s = []
-            s.extend(vs)
-            return s
-
         input = [[('k', i)] for i in range(5)]
 
         def func(dstream):
-            return dstream.updateStateByKey(updater)
+            return dstream.updateStateByKey(_list_extend_updater)
 
         expected = [[0], [0, 1], [0, 1, 2], [0, 1, 2, 3], [0, 1, 2, 3, 4]]
         expected = [[('k', v)] for v in expected]
@@ -385,6 +489,8 @@ class BasicOperationTests(PySparkStreamingTestCase):
 class WindowFunctionTests(PySparkStreamingTestCase):
 
     timeout = 15
+    # expected outputs assume one input RDD per .5s slide
+    duration = .5
 
     def test_window(self):
         input = [range(1), range(2), range(3), range(4), range(5)]
@@ -441,8 +547,6 @@ class WindowFunctionTests(PySparkStreamingTestCase):
 
 class StreamingContextTests(PySparkStreamingTestCase):
 
-    duration = 0.1
-
     def _add_input_stream(self):
         inputs = [range(1, x) for x in range(101)]
         stream = self.ssc.queueStream(inputs)
@@ -472,25 +576,31 @@ class StreamingContextTests(PySparkStreamingTestCase):
         dstream2 = self.ssc.textFileStream(d).map(int)
         result = self._collect(dstream2, 2, block=False)
         self.ssc.start()
-        for name in ('a', 'b'):
-            time.sleep(1)
-            with open(os.path.join(d, name), "w") as f:
-                f.writelines(["%d\n" % i for i in range(10)])
-        self.wait_for(result, 2)
+        # Only files modified after the stream was created are picked up, and the mtime may
+        # be seen at 1s resolution, so stamp the files instead of sleeping between them.
+        mtime = int(time.time()) + 1
+        for n, name in enumerate(('a', 'b')):
+            path = os.path.join(d, name)
+            _write_file(path, _NUM_PAYLOAD)
+            os.utime(path, (mtime, mtime))
+            # let each file land in its own batch
+            self.wait_for(result, n + 1)
         self.assertEqual([list(range(10)), list(range(10))], result)
 
     def test_binary_records_stream(self):
         d = tempfile.mkdtemp()
         self.ssc = StreamingContext(self.sc, self.duration)
-        dstream = self.ssc.binaryRecordsStream(d, 10).map(
-            lambda v: struct.unpack("10b", bytes(v)))
+        # records already arrive as bytes; a precompiled struct.Struct can't be used here
+        # because cloudpickle ships this module's globals by value and Struct can't be pickled
+        dstream = self.ssc.binaryRecordsStream(d, 10).map(lambda v: struct.unpack("10b", v))
         result = self._collect(dstream, 2, block=False)
         self.ssc.start()
-        for name in ('a', 'b'):
-            time.sleep(1)
-            with open(os.path.join(d, name), "wb") as f:
-                f.write(bytearray(range(10)))
-        self.wait_for(result, 2)
+        mtime = int(time.time()) + 1
+        for n, name in enumerate(('a', 'b')):
+            path = os.path.join(d, name)
+            _write_file(path, _BINARY_PAYLOAD)
+            os.utime(path, (mtime, mtime))
+            self.wait_for(result, n + 1)
         self.assertEqual([list(range(10)), list(range(10))], [list(v[0]) for v in result])
 
     def test_union(self):
@@ -518,19 +628,21 @@ class StreamingContextTests(PySparkStreamingTestCase):
 
 class CheckpointTests(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # getOrCreate() builds its own SparkContext and only one may be active at a time
+        _stop_spark_context()
+
     def test_get_or_create(self):
         inputd = tempfile.mkdtemp()
         outputd = tempfile.mkdtemp() + "/"
 
-        def updater(vs, s):
-            return sum(vs, s or 0)
-
         def setup():
             conf = SparkConf().set("spark.default.parallelism", 1)
             sc = SparkContext(conf=conf)
             ssc = StreamingContext(sc, 0.5)
             dstream = ssc.textFileStream(inputd).map(lambda x: (x, 1))
-            wc = dstream.updateStateByKey(updater)
+            wc = dstream.updateStateByKey(_sum_updater)
             wc.map(lambda x: "%s,%d" % x).saveAsTextFiles(outputd + "test")
             wc.checkpoint(.5)
             return ssc
@@ -543,8 +655,7 @@ class CheckpointTests(unittest.TestCase):
             while not os.listdir(outputd):
                 time.sleep(0.01)
             time.sleep(1)  # make sure mtime is larger than the previous one
-            with open(os.path.join(inputd, str(n)), 'w') as f:
-                f.writelines(["%d\n" % i for i in range(10)])
+            _write_file(os.path.join(inputd, str(n)), _NUM_PAYLOAD)
 
             while True:
                 p = os.path.join(outputd, max(os.listdir(outputd)))
@@ -584,8 +695,8 @@ class KafkaStreamTests(PySparkStreamingTestCase):
     def setUp(self):
         super(KafkaStreamTests, self).setUp()
 
-        kafkaTestUtilsClz = self.ssc._jvm.java.lang.Thread.currentThread().getContextClassLoader()\
-            .loadClass("org.apache.spark.streaming.kafka.KafkaTestUtils")
+        kafkaTestUtilsClz = \
+            _load_jvm_class(self.sc, "org.apache.spark.streaming.kafka.KafkaTestUtils")
         self._kafkaTestUtils = kafkaTestUtilsClz.newInstance()
         self._kafkaTestUtils.setup()
 
@@ -600,18 +711,17 @@ class KafkaStreamTests(PySparkStreamingTestCase):
         return "topic-%d" % random.randint(0, 10000)
 
     def _validateStreamResult(self, sendData, stream):
-        result = {}
+        # NOTE: defaultdict is used instead of collections.Counter for Python 2.6
+        result = defaultdict(int)
         for i in chain.from_iterable(self._collect(stream.map(lambda x: x[1]),
                                                    sum(sendData.values()))):
-            result[i] = result.get(i, 0) + 1
+            result[i] += 1
 
-        self.assertEqual(sendData, result)
+        self.assertEqual(sendData, dict(result))
 
     def _validateRddResult(self, sendData, rdd):
-        result = {}
-        for i in rdd.map(lambda x: x[1]).collect():
-            result[i] = result.get(i, 0) + 1
-        self.assertEqual(sendData, result)
+        result = rdd.map(lambda x: x[1]).countByValue()
+        self.assertEqual(sendData, dict(result))
 
     def test_kafka_stream(self):
         """Test the Python Kafka stream API."""
@@ -710,8 +820,9 @@ class KafkaStreamTests(PySparkStreamingTestCase):
         offsetRanges = []
 
         def getOffsetRanges(_, rdd):
-            for o in rdd.offsetRanges():
-                offsetRanges.append(o)
+            with self._cond:
+                offsetRanges.extend(rdd.offsetRanges())
+                self._cond.notify_all()
 
         stream.foreachRDD(getOffsetRanges)
         self.ssc.start()
@@ -735,8 +846,9 @@ class KafkaStreamTests(PySparkStreamingTestCase):
         offsetRanges = []
 
         def transformWithOffsetRanges(rdd):
-            for o in rdd.offsetRanges():
-                offsetRanges.append(o)
+            with self._cond:
+                offsetRanges.extend(rdd.offsetRanges())
+                self._cond.notify_all()
             return rdd
 
         stream.transform(transformWithOffsetRanges).foreachRDD(lambda rdd: rdd.count())
@@ -753,8 +865,7 @@ class FlumeStreamTests(PySparkStreamingTestCase):
     def setUp(self):
         super(FlumeStreamTests, self).setUp()
 
-        utilsClz = self.ssc._jvm.java.lang.Thread.currentThread().getContextClassLoader() \
-            .loadClass("org.apache.spark.streaming.flume.FlumeTestUtils")
+        utilsClz = _load_jvm_class(self.sc, "org.apache.spark.streaming.flume.FlumeTestUtils")
         self._utils = utilsClz.newInstance()
 
     def tearDown(self):
@@ -771,9 +882,10 @@ class FlumeStreamTests(PySparkStreamingTestCase):
         result = []
 
         def get_output(_, rdd):
-            for event in rdd.collect():
-                if len(result) < n:
-                    result.append(event)
+            events = rdd.collect()
+            with self._cond:
+                result.extend(events[:n - len(result)])
+                self._cond.notify_all()
         dstream.foreachRDD(get_output)
         self.ssc.start()
         return result
@@ -787,17 +899,19 @@ class FlumeStreamTests(PySparkStreamingTestCase):
             self.assertEqual(input[i], result[i][1])
 
     def _writeInput(self, input, compressed):
-        # Try to write input to the receiver until success or timeout
-        start_time = time.time()
+        # Try to write input to the receiver until success or timeout, backing off
+        # exponentially while the receiver is still starting up
+        deadline = time.time() + self.timeout
+        delay = 0.001
         while True:
             try:
                 self._utils.writeInput(input, compressed)
                 break
-            except:
-                if time.time() - start_time < self.timeout:
-                    time.sleep(0.01)
-                else:
+            except Py4JJavaError:
+                if time.time() > deadline:
                     raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
 
     def test_flume_stream(self):
         input = [str(i) for i in range(1, 101)]
@@ -819,40 +933,58 @@ class FlumePollingStreamTests(PySparkStreamingTestCase):
     duration = 1
     maxAttempts = 5
 
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
+        super(FlumePollingStreamTests, cls).setUpClass()
+        # every startSingleSink() call resets the utils, so one instance serves all tests
         utilsClz = \
-            self.sc._jvm.java.lang.Thread.currentThread().getContextClassLoader() \
-                .loadClass("org.apache.spark.streaming.flume.PollingFlumeTestUtils")
-        self._utils = utilsClz.newInstance()
+            _load_jvm_class(cls.sc, "org.apache.spark.streaming.flume.PollingFlumeTestUtils")
+        cls._utils = utilsClz.newInstance()
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._utils is not None:
+            cls._utils.close()
+            cls._utils = None
+        super(FlumePollingStreamTests, cls).tearDownClass()
+
+    # _writeAndVerify creates and stops a StreamingContext for every attempt
+    def setUp(self):
+        pass
 
     def tearDown(self):
-        if self._utils is not None:
-            self._utils.close()
-            self._utils = None
+        pass
 
     def _writeAndVerify(self, ports):
         # Set up the streaming context and input streams
         ssc = StreamingContext(self.sc, self.duration)
         try:
+            # both are JVM calls, so fetch them once up front
+            events_per_batch = self._utils.eventsPerBatch()
+            total_events = self._utils.getTotalEvents()
             addresses = [("localhost", port) for port in ports]
             dstream = FlumeUtils.createPollingStream(
                 ssc,
                 addresses,
-                maxBatchSize=self._utils.eventsPerBatch(),
+                maxBatchSize=events_per_batch,
                 parallelism=5)
             outputBuffer = []
+            done = threading.Event()
 
             def get_output(_, rdd):
-                for e in rdd.collect():
-                    outputBuffer.append(e)
+                outputBuffer.extend(rdd.collect())
+                if len(outputBuffer) >= total_events:
+                    done.set()
 
             dstream.foreachRDD(get_output)
             ssc.start()
             self._utils.sendDatAndEnsureAllDataHasBeenReceived()
 
-            self.wait_for(outputBuffer, self._utils.getTotalEvents())
-            outputHeaders = [event[0] for event in outputBuffer]
-            outputBodies = [event[1] for event in outputBuffer]
+            done.wait(self.timeout)
+            if outputBuffer:
+                outputHeaders, outputBodies = map(list, zip(*outputBuffer))
+            else:
+                outputHeaders, outputBodies = [], []
             self._utils.assertOutput(outputHeaders, outputBodies)
         finally:
             ssc.stop(False)
@@ -863,13 +995,14 @@ class FlumePollingStreamTests(PySparkStreamingTestCase):
             try:
                 f()
                 break
-            except:
+            except Exception:
                 attempt += 1
                 if attempt >= self.maxAttempts:
                     raise
                 else:
-                    import traceback
                     traceback.print_exc()
+                    # give the JVM-side Flume fixtures time to recover before retrying
+                    time.sleep(min(2 ** attempt * 0.1, 5.0))
 
     def _testFlumePolling(self):
         try:
@@ -901,10 +1034,10 @@ class MQTTStreamTests(PySparkStreamingTestCase):
     def setUp(self):
         super(MQTTStreamTests, self).setUp()
 
-        MQTTTestUtilsClz = self.ssc._jvm.java.lang.Thread.currentThread().getContextClassLoader() \
-            .loadClass("org.apache.spark.streaming.mqtt.MQTTTestUtils")
+        MQTTTestUtilsClz = _load_jvm_class(self.sc, "org.apache.spark.streaming.mqtt.MQTTTestUtils")
         self._MQTTTestUtils = MQTTTestUtilsClz.newInstance()
         self._MQTTTestUtils.setup()
+        self._result_ready = threading.Event()
 
     def tearDown(self):
         if self._MQTTTestUtils is not None:
@@ -917,13 +1050,17 @@ class MQTTStreamTests(PySparkStreamingTestCase):
         return "topic-%d" % random.randint(0, 10000)
 
     def _startContext(self, topic):
-        # Start the StreamingContext and also collect the result
+        # Start the StreamingContext and also keep the first message received; it is
+        # all the test looks at, as "publishData" sends duplicate messages
         stream = MQTTUtils.createStream(self.ssc, "tcp://" + self._MQTTTestUtils.brokerUri(), topic)
-        result = []
+        result = [None]
 
         def getOutput(_, rdd):
-            for data in rdd.collect():
-                result.append(data)
+            if result[0] is None:
+                data = rdd.take(1)
+                if data:
+                    result[0] = data[0]
+                    self._result_ready.set()
 
         stream.foreachRDD(getOutput)
         self.ssc.start()
@@ -937,8 +1074,6 @@ class MQTTStreamTests(PySparkStreamingTestCase):
 
         def retry():
             self._MQTTTestUtils.publishData(topic, sendData)
-            # Because "publishData" sends duplicate messages, here we should use > 0
-            self.assertTrue(len(result) > 0)
             self.assertEqual(sendData, result[0])
 
         # Retry it because we don't know when the receiver will start.
@@ -950,13 +1085,18 @@ class MQTTStreamTests(PySparkStreamingTestCase):
             try:
                 test_func()
                 break
-            except:
-                if time.time() - start_time > self.timeout:
+            except Exception:
+                remaining = self.timeout - (time.time() - start_time)
+                if remaining <= 0:
                     raise
-                time.sleep(0.01)
+                # Retry as soon as the stream produces output, or after a batch interval
+                # in case the receiver was not listening yet when test_func() sent data.
+                self._result_ready.wait(min(remaining, self.duration))
+                self._result_ready.clear()
 
 
 class KinesisStreamTests(PySparkStreamingTestCase):
+    duration = .5
 
     def test_kinesis_stream_api(self):
         # Don't start the StreamingContext because we cannot test it in Jenkins
@@ -970,18 +1110,12 @@ class KinesisStreamTests(PySparkStreamingTestCase):
             InitialPositionInStream.LATEST, 2, StorageLevel.MEMORY_AND_DISK_2,
             "awsAccessKey", "awsSecretKey")
 
+    @unittest.skipUnless(are_kinesis_tests_enabled,
+                         "enable by setting environment variable %s=1" % kinesis_test_environ_var)
     def test_kinesis_stream(self):
-        if not are_kinesis_tests_enabled:
-            sys.stderr.write(
-                "Skipped test_kinesis_stream (enable by setting environment variable %s=1"
-                % kinesis_test_environ_var)
-            return
-
-        import random
         kinesisAppName = ("KinesisStreamTests-%d" % abs(random.randint(0, 10000000)))
         kinesisTestUtilsClz = \
-            self.sc._jvm.java.lang.Thread.currentThread().getContextClassLoader() \
-                .loadClass("org.apache.spark.streaming.kinesis.KinesisTestUtils")
+            _load_jvm_class(self.sc, "org.apache.spark.streaming.kinesis.KinesisTestUtils")
         kinesisTestUtils = kinesisTestUtilsClz.newInstance()
         try:
             kinesisTestUtils.createStream()
@@ -992,26 +1126,32 @@ class KinesisStreamTests(PySparkStreamingTestCase):
                 InitialPositionInStream.LATEST, 10, StorageLevel.MEMORY_ONLY,
                 aWSCredentials.getAWSAccessKeyId(), aWSCredentials.getAWSSecretKey())
 
-            outputBuffer = []
+            received = set()
 
             def get_output(_, rdd):
-                for e in rdd.collect():
-                    outputBuffer.append(e)
+                data = rdd.collect()
+                with self._cond:
+                    received.update(data)
+                    self._cond.notify_all()
 
             stream.foreachRDD(get_output)
             self.ssc.start()
 
-            testData = [i for i in range(1, 11)]
-            expectedOutput = set([str(i) for i in testData])
+            testData = list(range(1, 11))
+            expectedOutput = set(str(i) for i in testData)
             start_time = time.time()
             while time.time() - start_time < 120:
                 kinesisTestUtils.pushData(testData)
-                if expectedOutput == set(outputBuffer):
-                    break
-                time.sleep(10)
-            self.assertEqual(expectedOutput, set(outputBuffer))
-        except:
-            import traceback
+                push_time = time.time()
+                with self._cond:
+                    # wait for the data to show up, pushing it again every 10 seconds
+                    while not expectedOutput <= received and time.time() - push_time < 10:
+                        self._cond.wait(10 - (time.time() - push_time))
+                    if expectedOutput <= received:
+                        break
+            with self._cond:
+                self.assertEqual(expectedOutput, received)
+        except Exception:
             traceback.print_exc()
             raise
         finally:
@@ -1020,111 +1160,109 @@ class KinesisStreamTests(PySparkStreamingTestCase):
             kinesisTestUtils.deleteDynamoDBTable(kinesisAppName)
 
 
-def search_kafka_assembly_jar():
-    SPARK_HOME = os.environ["SPARK_HOME"]
-    kafka_assembly_dir = os.path.join(SPARK_HOME, "external/kafka-assembly")
-    jars = glob.glob(
-        os.path.join(kafka_assembly_dir, "target/scala-*/spark-streaming-kafka-assembly-*.jar"))
+def _find_jars(jar_dir, prefix):
+    """List the jars in `jar_dir`/target/scala-*/ whose names start with `prefix`."""
+    target_dir = os.path.join(jar_dir, "target")
+    if not os.path.isdir(target_dir):
+        return []
+    jars = []
+    for d in os.listdir(target_dir):
+        scala_dir = os.path.join(target_dir, d)
+        if d.startswith("scala-") and os.path.isdir(scala_dir):
+            jars.extend(os.path.join(scala_dir, f) for f in os.listdir(scala_dir)
+                        if f.startswith(prefix) and f.endswith(".jar"))
+    return jars
+
+
+def _find_single_jar(subdir, prefix, name, build_hint, required=True):
+    """
+    Return the one jar under SPARK_HOME/`subdir`/target/scala-* named `prefix`*.jar.
+
+    If there is none, raise an exception telling how to build it, or return None
+    when the jar is not `required`.
+    """
+    jar_dir = os.path.join(os.environ["SPARK_HOME"], subdir)
+    jars = _find_jars(jar_dir, prefix)
     if not jars:
+        if not required:
+            return None
         raise Exception(
-            ("Failed to find Spark Streaming kafka assembly jar in %s. " % kafka_assembly_dir) +
-            "You need to build Spark with "
-            "'build/sbt assembly/assembly streaming-kafka-assembly/assembly' or "
-            "'build/mvn package' before running this test.")
+            ("Failed to find %s in %s. " % (name, jar_dir)) +
+            ("You need to build Spark with %s before running this test." % build_hint))
     elif len(jars) > 1:
-        raise Exception(("Found multiple Spark Streaming Kafka assembly JARs in %s; please "
-                         "remove all but one") % kafka_assembly_dir)
+        raise Exception("Found multiple %ss in %s; please remove all but one" % (name, jar_dir))
     else:
         return jars[0]
 
 
+def search_kafka_assembly_jar():
+    return _find_single_jar(
+        "external/kafka-assembly", "spark-streaming-kafka-assembly-",
+        "Spark Streaming Kafka assembly JAR",
+        "'build/sbt assembly/assembly streaming-kafka-assembly/assembly' or 'build/mvn package'")
+
+
 def search_flume_assembly_jar():
-    SPARK_HOME = os.environ["SPARK_HOME"]
-    flume_assembly_dir = os.path.join(SPARK_HOME, "external/flume-assembly")
-    jars = glob.glob(
-        os.path.join(flume_assembly_dir, "target/scala-*/spark-streaming-flume-assembly-*.jar"))
-    if not jars:
-        raise Exception(
-            ("Failed to find Spark Streaming Flume assembly jar in %s. " % flume_assembly_dir) +
-            "You need to build Spark with "
-            "'build/sbt assembly/assembly streaming-flume-assembly/assembly' or "
-            "'build/mvn package' before running this test.")
-    elif len(jars) > 1:
-        raise Exception(("Found multiple Spark Streaming Flume assembly JARs in %s; please "
-                        "remove all but one") % flume_assembly_dir)
-    else:
-        return jars[0]
+    return _find_single_jar(
+        "external/flume-assembly", "spark-streaming-flume-assembly-",
+        "Spark Streaming Flume assembly JAR",
+        "'build/sbt assembly/assembly streaming-flume-assembly/assembly' or 'build/mvn package'")
 
 
 def search_mqtt_assembly_jar():
-    SPARK_HOME = os.environ["SPARK_HOME"]
-    mqtt_assembly_dir = os.path.join(SPARK_HOME, "external/mqtt-assembly")
-    jars = glob.glob(
-        os.path.join(mqtt_assembly_dir, "target/scala-*/spark-streaming-mqtt-assembly-*.jar"))
-    if not jars:
-        raise Exception(
-            ("Failed to find Spark Streaming MQTT assembly jar in %s. " % mqtt_assembly_dir) +
-            "You need to build Spark with "
-            "'build/sbt assembly/assembly streaming-mqtt-assembly/assembly' or "
-            "'build/mvn package' before running this test")
-    elif len(jars) > 1:
-        raise Exception(("Found multiple Spark Streaming MQTT assembly JARs in %s; please "
-                         "remove all but one") % mqtt_assembly_dir)
-    else:
-        return jars[0]
+    return _find_single_jar(
+        "external/mqtt-assembly", "spark-streaming-mqtt-assembly-",
+        "Spark Streaming MQTT assembly JAR",
+        "'build/sbt assembly/assembly streaming-mqtt-assembly/assembly' or 'build/mvn package'")
 
 
 def search_mqtt_test_jar():
-    SPARK_HOME = os.environ["SPARK_HOME"]
-    mqtt_test_dir = os.path.join(SPARK_HOME, "external/mqtt")
-    jars = glob.glob(
-        os.path.join(mqtt_test_dir, "target/scala-*/spark-streaming-mqtt-test-*.jar"))
-    if not jars:
-        raise Exception(
-            ("Failed to find Spark Streaming MQTT test jar in %s. " % mqtt_test_dir) +
-            "You need to build Spark with "
-            "'build/sbt assembly/assembly streaming-mqtt/test:assembly'")
-    elif len(jars) > 1:
-        raise Exception(("Found multiple Spark Streaming MQTT test JARs in %s; please "
-                         "remove all but one") % mqtt_test_dir)
-    else:
-        return jars[0]
-
-
-def search_kinesis_asl_assembly_jar():
-    SPARK_HOME = os.environ["SPARK_HOME"]
-    kinesis_asl_assembly_dir = os.path.join(SPARK_HOME, "extras/kinesis-asl-assembly")
-    jars = glob.glob(
-        os.path.join(kinesis_asl_assembly_dir,
-                     "target/scala-*/spark-streaming-kinesis-asl-assembly-*.jar"))
-    if not jars:
-        return None
-    elif len(jars) > 1:
-        raise Exception(("Found multiple Spark Streaming Kinesis ASL assembly JARs in %s; please "
-                         "remove all but one") % kinesis_asl_assembly_dir)
-    else:
-        return jars[0]
-
+    return _find_single_jar(
+        "external/mqtt", "spark-streaming-mqtt-test-",
+        "Spark Streaming MQTT test JAR",
+        "'build/sbt assembly/assembly streaming-mqtt/test:assembly'")
+
+
+def search_kinesis_asl_assembly_jar(required=False):
+    return _find_single_jar(
+        "extras/kinesis-asl-assembly", "spark-streaming-kinesis-asl-assembly-",
+        "Spark Streaming Kinesis ASL assembly JAR",
+        "'build/sbt -Pkinesis-asl assembly/assembly streaming-kinesis-asl-assembly/assembly' "
+        "or 'build/mvn -Pkinesis-asl package'",
+        required=required)
+
+
+def run_testcase_isolated(testcase):
+    """
+    Run `testcase` in the current (forked) process and return its report.
+    The SparkContext and JVM gateway it creates are private to this
+    process, so several of these can run concurrently.
+    """
+    with tempfile.TemporaryFile(mode="w+") as stream:
+        try:
+            tests = unittest.TestLoader().loadTestsFromTestCase(testcase)
+            unittest.TextTestRunner(stream=stream, verbosity=2).run(tests)
+        finally:
+            _stop_spark_context()
+        stream.seek(0)
+        return stream.read()
 
-# Must be same as the variable and condition defined in KinesisTestUtils.scala
-kinesis_test_environ_var = "ENABLE_KINESIS_TESTS"
-are_kinesis_tests_enabled = os.environ.get(kinesis_test_environ_var) == '1'
 
 if __name__ == "__main__":
-    kafka_assembly_jar = search_kafka_assembly_jar()
-    flume_assembly_jar = search_flume_assembly_jar()
-    mqtt_assembly_jar = search_mqtt_assembly_jar()
-    mqtt_test_jar = search_mqtt_test_jar()
-    kinesis_asl_assembly_jar = search_kinesis_asl_assembly_jar()
-
-    if kinesis_asl_assembly_jar is None:
-        kinesis_jar_present = False
-        jars = "%s,%s,%s,%s" % (kafka_assembly_jar, flume_assembly_jar, mqtt_assembly_jar,
-                                mqtt_test_jar)
-    else:
-        kinesis_jar_present = True
-        jars = "%s,%s,%s,%s,%s" % (kafka_assembly_jar, flume_assembly_jar, mqtt_assembly_jar,
-                                   mqtt_test_jar, kinesis_asl_assembly_jar)
+    # the searches only stat the filesystem, so overlap them
+    searches = [search_kafka_assembly_jar, search_flume_assembly_jar, search_mqtt_assembly_jar,
+                search_mqtt_test_jar, search_kinesis_asl_assembly_jar]
+    search_pool = ThreadPool(len(searches))
+    try:
+        kafka_assembly_jar, flume_assembly_jar, mqtt_assembly_jar, mqtt_test_jar, \
+            kinesis_asl_assembly_jar = search_pool.map(lambda search: search(), searches)
+    finally:
+        search_pool.close()
+        search_pool.join()
+
+    kinesis_jar_present = kinesis_asl_assembly_jar is not None
+    jars = ",".join(jar for jar in [kafka_assembly_jar, flume_assembly_jar, mqtt_assembly_jar,
+                                    mqtt_test_jar, kinesis_asl_assembly_jar] if jar)
 
     os.environ["PYSPARK_SUBMIT_ARGS"] = "--jars %s pyspark-shell" % jars
     testcases = [BasicOperationTests, WindowFunctionTests, StreamingContextTests,
@@ -1139,15 +1277,32 @@ if __name__ == "__main__":
                          "streaming-kinesis-asl-assembly/assembly' or "
                          "'build/mvn -Pkinesis-asl package' before running this test.")
     else:
-        raise Exception(
-            ("Failed to find Spark Streaming Kinesis assembly jar in %s. "
-             % kinesis_asl_assembly_dir) +
-            "You need to build Spark with 'build/sbt -Pkinesis-asl "
-            "assembly/assembly streaming-kinesis-asl-assembly/assembly'"
-            "or 'build/mvn -Pkinesis-asl package' before running this test.")
+        # the Kinesis tests were enabled explicitly, so the missing jar is an error
+        search_kinesis_asl_assembly_jar(required=True)
 
     sys.stderr.write("Running tests: %s \n" % (str(testcases)))
-    for testcase in testcases:
-        sys.stderr.write("[Running %s]\n" % (testcase))
-        tests = unittest.TestLoader().loadTestsFromTestCase(testcase)
-        unittest.TextTestRunner(verbosity=2).run(tests)
+
+    # These suites need nothing but a SparkContext, so each one runs in a forked process
+    # with its own JVM gateway (ephemeral ports, so they don't collide). The others grab
+    # JVM-side fixtures or, like CheckpointTests, manage their own context and run serially.
+    # Forking must happen before this process starts a gateway of its own.
+    parallel_testcases = [BasicOperationTests, WindowFunctionTests, StreamingContextTests]
+    if "PYSPARK_GATEWAY_PORT" in os.environ:
+        # an existing gateway would be shared by all the workers
+        parallel_testcases = []
+    if parallel_testcases:
+        pool = multiprocessing.Pool(len(parallel_testcases))
+        try:
+            reports = pool.map(run_testcase_isolated, parallel_testcases)
+        finally:
+            pool.close()
+            pool.join()
+        for testcase, report in zip(parallel_testcases, reports):
+            sys.stderr.write("[Running %s]\n" % (testcase))
+            sys.stderr.write(report)
+
+    # run the rest as a single suite; verbose output still names each test's class
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite([loader.loadTestsFromTestCase(testcase) for testcase in testcases
+                                if testcase not in parallel_testcases])
+    unittest.TextTestRunner(verbosity=2).run(suite)